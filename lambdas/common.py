@@ -0,0 +1,38 @@
+'''
+Code shared by the Order Creation and Order Processing lambda functions
+'''
+
+from os import environ
+from typing import TYPE_CHECKING, Any
+import orjson
+from boto3 import client
+from botocore.config import Config
+
+# Only needed for type hints, so keep powertools out of the cold start import path
+if TYPE_CHECKING:
+    from aws_lambda_powertools.utilities.typing import LambdaContext
+else:
+    LambdaContext = Any
+
+# Keep the TLS connection alive between warm invocations and fail fast on slow calls
+# Request keys are fixed and the handlers reject non-string caller values (e.g. orderId) with a 400,
+# so botocore's per-call parameter validation can be skipped
+# (both guards are covered by test_type_guards_with_parameter_validation_disabled)
+# A lambda handles one request at a time, so a single pooled connection is all it needs
+# 2 attempts of at most 1s connect + 2s read, plus backoff, stay well inside the 10s lambda timeout
+client_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=1,
+    retries={"max_attempts": 2, "mode": "standard"},
+    connect_timeout=1,
+    read_timeout=2,
+    parameter_validation=False
+)
+dynamodb = client("dynamodb", config=client_config)
+
+# Read the orders table name once per container rather than on every invocation
+TABLE_NAME = environ.get("TABLE_NAME")
+
+def dumps(obj: Any) -> str:
+    '''Serialises an object to a JSON string (orjson returns bytes)'''
+    return orjson.dumps(obj).decode()
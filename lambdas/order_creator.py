@@ -2,37 +2,47 @@
 Code for the Order Creation lambda function
 '''
 
-from os import environ
-from json import loads, dumps, JSONDecodeError
-from typing import Any, Dict
-from boto3 import resource, client
-from boto3.dynamodb.conditions import Attr
+import logging
+import re
+from typing import Any, Dict, Optional
+import orjson
 from botocore.exceptions import ClientError
-from aws_lambda_powertools import Logger
-from aws_lambda_powertools.utilities.typing import LambdaContext
+from common import TABLE_NAME, LambdaContext, dumps, dynamodb
 
-logger = Logger(service="OrderCreator")
-dynamodb = resource("dynamodb")
-events_client = client("events")
+logger = logging.getLogger("OrderCreator")
+logger.setLevel(logging.INFO)
+
+# Matches a body that starts with a JSON object, without copying the body
+JSON_OBJECT_START = re.compile(r"\s*\{")
+
+def parse_order(body: Any) -> Optional[Dict[str, Any]]:
+    '''Parses a JSON string body into an order, returning None if it is not a JSON object'''
+
+    # An order must be a JSON object, so sniff the first character before running the parser
+    if not isinstance(body, str) or not JSON_OBJECT_START.match(body):
+        return None
+
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
 
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     '''Handles order creation requests'''
 
     # Ensure that the table name exists in the environment
-    table_name = environ.get("TABLE_NAME")
-    if not table_name:
+    if not TABLE_NAME:
         logger.error("TABLE_NAME environment variable is missing")
 
         # Return the failed response
         return {"statusCode": 500, "body": dumps({"error": "Server misconfiguration"})}
 
-    table = dynamodb.Table(table_name)
-
     # Parse the body of the event
-    body = event.get("body", "{}")
-    try:
-        order = loads(body) if isinstance(body, str) else body
-    except JSONDecodeError:
+    # Direct invocations can pass the order itself or an already parsed body,
+    # so only a JSON string body needs to be decoded
+    body = event.get("body") or event
+    order = body if isinstance(body, dict) else parse_order(body)
+    if order is None:
         logger.error("Invalid JSON in request body")
 
         # Return the failed response
@@ -46,47 +56,46 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         # Return the failed response
         return {"statusCode": 400, "body": dumps({"error": "Missing 'orderId' in request"})}
 
-    # Get the item from the event
-    item = order.get("item", "unknown")
+    # The orderId is stored as a DynamoDB string attribute
+    if not isinstance(order_id, str):
+        logger.error("Invalid 'orderId' in request")
+
+        # Return the failed response
+        return {"statusCode": 400, "body": dumps({"error": "'orderId' must be a string"})}
+
+    # Get the item from the event (also stored as a DynamoDB string attribute)
+    item = order.get("item")
+    if item is None:
+        item = "unknown"
+    elif not isinstance(item, str):
+        logger.error("Invalid 'item' in request")
+
+        # Return the failed response
+        return {"statusCode": 400, "body": dumps({"error": "'item' must be a string"})}
 
     # Write the new order to the orders table in DynamoDB
     # Only insert if there isn’t already an item with this orderId
     try:
-        table.put_item(
-            Item={"orderId": order_id, "status": "NEW", "item": item},
-            ConditionExpression=Attr("orderId").not_exists()
+        dynamodb.put_item(
+            TableName=TABLE_NAME,
+            Item={"orderId": {"S": order_id}, "status": {"S": "NEW"}, "item": {"S": item}},
+            ConditionExpression="attribute_not_exists(orderId)",
+            ReturnValues="NONE",
+            ReturnConsumedCapacity="NONE",
+            ReturnItemCollectionMetrics="NONE"
         )
 
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            logger.error(f"Order {order_id} already exists")
+            logger.error("Order %s already exists", order_id)
             return {"statusCode": 409, "body": dumps({"error": "Order already exists"})}
 
-        logger.exception(f"Unexpected error writing order {order_id}")
+        logger.exception("Unexpected error writing order %s", order_id)
         return {"statusCode": 500, "body": dumps({"error": "Internal server error"})}
 
-    logger.info(f"Order {order_id} created")
+    logger.info("Order %s created", order_id)
 
-    # Publish an event to event-bridge to indicate that the new order has been created
-    try:
-        events_client.put_events(
-            Entries=[
-                {
-                    "Source": "serverless.snacks",
-                    "DetailType": "OrderCreated",
-                    "Detail": dumps({"orderId": order_id, "item": item}),
-                    "EventBusName": "OrderEventBus"
-                }
-            ]
-        )
-
-        logger.info(f"Event published for order {order_id}")
-
-    except (ClientError) as e:
-        logger.error(f"Failed to publish event: {e}")
-
-        # Return the failed response
-        return {"statusCode": 502, "body": dumps({"error": "Failed to publish event"})}
+    # The OrderCreated event is published to event-bridge from the table stream (see the stack's pipe)
 
     # Return the success response
     return {"statusCode": 200, "body": dumps({"orderId": order_id, "status": "NEW"})}
@@ -2,35 +2,30 @@
 Code for the Order Processing lambda function
 '''
 
-from os import environ
-from json import dumps
+import logging
 from typing import Any, Dict
-from boto3 import resource
-from boto3.dynamodb.conditions import Attr
 from botocore.exceptions import ClientError
-from aws_lambda_powertools import Logger
-from aws_lambda_powertools.utilities.typing import LambdaContext
+from common import TABLE_NAME, LambdaContext, dumps, dynamodb
 
-logger = Logger(service="OrderProcessor")
-dynamodb = resource("dynamodb")
+logger = logging.getLogger("OrderProcessor")
+logger.setLevel(logging.INFO)
 
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     '''Handles order processing events'''
 
     # Get the table name
-    table_name = environ.get("TABLE_NAME")
-    if not table_name:
+    if not TABLE_NAME:
         logger.error("TABLE_NAME environment variable is missing")
 
         # Return the failed response
         return {"statusCode": 500, "body": dumps({"error": "Server misconfiguration"})}
 
-    table = dynamodb.Table(table_name)
-
     # Parse the orderId from the event
-    order = event.get("detail")
-    order_id = order.get("orderId") if order else None
-    if not order_id:
+    # The OrderCreated detail is the DynamoDB stream record of the new order
+    order = event.get("detail") or {}
+    new_image = order.get("dynamodb", {}).get("NewImage", {})
+    order_id = new_image.get("orderId", {}).get("S")
+    if not order_id or not isinstance(order_id, str):
         logger.error("Invalid event: missing 'detail' or 'orderId'")
 
         # Return the failed response
@@ -39,23 +34,27 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     # Update the order status for this orderId in the DynamoDB table
     # Only update if orderId exists
     try:
-        table.update_item(
-            Key={"orderId": order_id},
+        dynamodb.update_item(
+            TableName=TABLE_NAME,
+            Key={"orderId": {"S": order_id}},
             UpdateExpression="SET #status = :status",
             ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={":status": "PROCESSED"},
-            ConditionExpression=Attr("orderId").exists()
+            ExpressionAttributeValues={":status": {"S": "PROCESSED"}},
+            ConditionExpression="attribute_exists(orderId)",
+            ReturnValues="NONE",
+            ReturnConsumedCapacity="NONE",
+            ReturnItemCollectionMetrics="NONE"
         )
     except ClientError as e:
         if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
-            logger.error(f"Order {order_id} does not exist. Cannot process.")
+            logger.error("Order %s does not exist. Cannot process.", order_id)
         else:
-            logger.exception(f"Error processing order {order_id}")
+            logger.exception("Error processing order %s", order_id)
 
         # Raise an exception so that the lambda can retry or send to the dead letter queue
         raise
 
-    logger.info(f"Order {order_id} processed")
+    logger.info("Order %s processed", order_id)
 
     # Return the success response
     return {"statusCode": 200, "body": dumps({"orderId": order_id, "status": "PROCESSED"})}
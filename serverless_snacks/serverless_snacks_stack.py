@@ -1,11 +1,16 @@
 '''Define the AWS infrastructure for the Serverless Snacks application using AWS CDK'''
 
+from json import dumps
+from typing import List
+import jsii
 from aws_cdk import (
     Stack,
     aws_dynamodb as dynamodb,
     aws_lambda as _lambda,
     aws_events as events,
     aws_events_targets as targets,
+    aws_iam as iam,
+    aws_pipes as pipes,
     aws_sqs as sqs,
     aws_sns as sns,
     aws_sns_subscriptions as subscriptions,
@@ -14,9 +19,28 @@ from aws_cdk import (
     Duration,
     RemovalPolicy,
 )
-from aws_cdk.aws_lambda_python_alpha import PythonFunction
+from aws_cdk.aws_lambda_python_alpha import BundlingOptions, ICommandHooks, PythonFunction
 from constructs import Construct
 
+# Event-bridge names shared by the order rule and the table stream pipe
+ORDER_EVENT_BUS_NAME = "OrderEventBus"
+ORDER_EVENT_SOURCE = "serverless.snacks"
+ORDER_CREATED_DETAIL_TYPE = "OrderCreated"
+
+@jsii.implements(ICommandHooks)
+class PrecompileBytecodeHooks:
+    '''Precompile the bundled lambda code so the read-only task root needs no compiling at cold start'''
+
+    def before_bundling(self, input_dir: str, output_dir: str) -> List[str]:
+        '''No commands are needed before installing the requirements'''
+        return []
+
+    def after_bundling(self, input_dir: str, output_dir: str) -> List[str]:
+        '''Compile every bundled module to bytecode'''
+
+        # The asset zip does not keep file timestamps, so the .pyc files must not be validated against them
+        return [f"python -m compileall -q --invalidation-mode unchecked-hash {output_dir}"]
+
 class ServerlessSnacksStack(Stack):
     '''Define the Serverless Snacks application stack'''
 
@@ -32,39 +56,29 @@ class ServerlessSnacksStack(Stack):
                 type=dynamodb.AttributeType.STRING
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
-            removal_policy=RemovalPolicy.DESTROY
+            removal_policy=RemovalPolicy.DESTROY,
+            stream=dynamodb.StreamViewType.NEW_IMAGE
         )
 
         # Create the SQS dead letter queue for storing failed messages
         dlq = sqs.Queue(self, "OrderProcessingDLQ")
 
-        # Create an SNS topic for dead letter queue alerts
-        dlq_alert_topic = sns.Topic(
-            self, "DLQAlertTopic",
-            display_name="DLQ Alerts for Serverless Snacks"
-        )
+        # Create the alarm and email alerts for the dead letter queue
+        dlq_alert_topic = self.create_dlq_alerts(dlq)
 
-        # Subscribe an email address to the SNS topic for receiving the alerts
-        dlq_alert_topic.add_subscription(
-            subscriptions.EmailSubscription("louis_gilmartin@hotmail.co.uk")
+        # Bundling options shared by both lambdas
+        # boto3 is provided by the lambda runtime, so only orjson is bundled and everything is precompiled
+        # pip only installs prebuilt manylinux aarch64 wheels, whatever the build host, so orjson is
+        # never compiled from source; local bytecode caches are left out of the asset
+        lambda_bundling = BundlingOptions(
+            asset_excludes=["__pycache__"],
+            environment={
+                "PIP_PLATFORM": "manylinux2014_aarch64",
+                "PIP_ONLY_BINARY": ":all:"
+            },
+            command_hooks=PrecompileBytecodeHooks()
         )
 
-        # Create a cloud-watch metric for the number of items in the dead letter queue
-        dlq_metric = dlq.metric_approximate_number_of_messages_visible(period=Duration.minutes(1))
-
-        # Create a cloud-watch alarm when the dead letter queue contains 5 or more messages
-        dlq_alarm = cloudwatch.Alarm(
-            self, "DLQAlarm",
-            metric=dlq_metric,
-            evaluation_periods=1,
-            threshold=5,
-            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
-            alarm_description="Alarm if there are 5 or more messages in the DLQ"
-        )
-
-        # Send SNS notification when the alarm triggers
-        dlq_alarm.add_alarm_action(cw_actions.SnsAction(dlq_alert_topic))
-
         # Create the first lambda (Order Creation)
         # This lambda handles order creation (receives requests and writes to DynamoDB)
         order_creator_lambda = PythonFunction(
@@ -72,9 +86,21 @@ class ServerlessSnacksStack(Stack):
             entry="lambdas",
             index="order_creator.py",
             handler="handler",
-            runtime=_lambda.Runtime.PYTHON_3_9,
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             environment={"TABLE_NAME": orders_table.table_name},
-            timeout=Duration.seconds(30)
+            memory_size=512,
+            timeout=Duration.seconds(10),
+            bundling=lambda_bundling,
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS
+        )
+
+        # SnapStart only applies to published versions, so invoke the creator through an alias
+        # that always points at the latest version (restored from a snapshot instead of a cold start)
+        _lambda.Alias(
+            self, "OrderCreatorLiveAlias",
+            alias_name="live",
+            version=order_creator_lambda.current_version
         )
 
         # Create the second lambda (Order Processing)
@@ -85,9 +111,12 @@ class ServerlessSnacksStack(Stack):
             entry="lambdas",
             index="order_processor.py",
             handler="handler",
-            runtime=_lambda.Runtime.PYTHON_3_9,
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             environment={"TABLE_NAME": orders_table.table_name},
-            timeout=Duration.seconds(30),
+            memory_size=512,
+            timeout=Duration.seconds(10),
+            bundling=lambda_bundling,
             dead_letter_queue=dlq
         )
 
@@ -102,20 +131,128 @@ class ServerlessSnacksStack(Stack):
         # Defines a rule to trigger the Order Processor lambda when an order has been created
         event_bus = events.EventBus(
             self, "OrderEventBus",
-            event_bus_name="OrderEventBus"
+            event_bus_name=ORDER_EVENT_BUS_NAME
         )
 
         rule = events.Rule(
             self, "OrderRule",
             event_pattern=events.EventPattern(
-                source=["serverless.snacks"],
-                detail_type=["OrderCreated"]
+                source=[ORDER_EVENT_SOURCE],
+                detail_type=[ORDER_CREATED_DETAIL_TYPE]
             ),
             event_bus=event_bus
         )
         # Attach the Order Processor lambda as the target of this rule
         rule.add_target(targets.LambdaFunction(order_processor_lambda))
 
-        # Grant Order Creator lambda permission to publish events to event-bridge
-        # This allows it to notify the event bus when a new order has been created
-        event_bus.grant_put_events_to(order_creator_lambda)
+        # Create the role used by the event-bridge pipe
+        # It can read the orders table stream and publish to the event bus
+        pipe_role = iam.Role(
+            self, "OrderCreatedPipeRole",
+            assumed_by=iam.ServicePrincipal("pipes.amazonaws.com")
+        )
+        orders_table.grant_stream_read(pipe_role)
+        event_bus.grant_put_events_to(pipe_role)
+
+        # Create the SQS dead letter queue for stream records the pipe fails to deliver
+        # Without it a failing record would be retried until it expires from the stream (24 hours),
+        # blocking every later order in the same shard
+        pipe_dlq = sqs.Queue(self, "OrderCreatedPipeDLQ")
+        pipe_dlq.grant_send_messages(pipe_role)
+
+        # Alert on any undelivered OrderCreated event, as those orders will never be processed
+        self.add_dlq_alarm(
+            "OrderCreatedPipeDLQAlarm",
+            pipe_dlq,
+            threshold=1,
+            alarm_description="Alarm if any OrderCreated events could not be published by the pipe",
+            alert_topic=dlq_alert_topic
+        )
+
+        # Create the event-bridge pipe from the orders table stream to the event bus
+        # New orders (stream INSERT records) are published as OrderCreated events,
+        # so the Order Creator lambda only has to make a single synchronous DynamoDB write
+        # The event detail is the stream record itself: an input template would not JSON-escape
+        # the order's string values, so any quote or backslash in an item would break the event
+        pipe = pipes.CfnPipe(
+            self, "OrderCreatedPipe",
+            role_arn=pipe_role.role_arn,
+            source=orders_table.table_stream_arn,
+            source_parameters=pipes.CfnPipe.PipeSourceParametersProperty(
+                dynamo_db_stream_parameters=pipes.CfnPipe.PipeSourceDynamoDBStreamParametersProperty(
+                    starting_position="LATEST",
+                    maximum_retry_attempts=3,
+                    dead_letter_config=pipes.CfnPipe.DeadLetterConfigProperty(arn=pipe_dlq.queue_arn)
+                ),
+                filter_criteria=pipes.CfnPipe.FilterCriteriaProperty(
+                    filters=[pipes.CfnPipe.FilterProperty(pattern=dumps({"eventName": ["INSERT"]}))]
+                )
+            ),
+            target=event_bus.event_bus_arn,
+            target_parameters=pipes.CfnPipe.PipeTargetParametersProperty(
+                event_bridge_event_bus_parameters=pipes.CfnPipe.PipeTargetEventBridgeEventBusParametersProperty(
+                    source=ORDER_EVENT_SOURCE,
+                    detail_type=ORDER_CREATED_DETAIL_TYPE
+                )
+            )
+        )
+
+        # The pipe checks its source and target permissions on creation, so wait for the role's policy
+        pipe.node.add_dependency(pipe_role)
+
+    def create_dlq_alerts(self, dlq: sqs.Queue) -> sns.Topic:
+        '''Create the dead letter queue alarm and the SNS topic that emails its alerts'''
+
+        # Create an SNS topic for dead letter queue alerts
+        dlq_alert_topic = sns.Topic(
+            self, "DLQAlertTopic",
+            display_name="DLQ Alerts for Serverless Snacks"
+        )
+
+        # Subscribe an email address to the SNS topic for receiving the alerts
+        dlq_alert_topic.add_subscription(
+            subscriptions.EmailSubscription("louis_gilmartin@hotmail.co.uk")
+        )
+
+        # Create a cloud-watch alarm when the dead letter queue contains 5 or more messages
+        self.add_dlq_alarm(
+            "DLQAlarm",
+            dlq,
+            threshold=5,
+            alarm_description="Alarm if there are 5 or more messages in the DLQ",
+            alert_topic=dlq_alert_topic
+        )
+
+        return dlq_alert_topic
+
+    def add_dlq_alarm(
+        self,
+        alarm_id: str,
+        dlq: sqs.Queue,
+        threshold: int,
+        alarm_description: str,
+        alert_topic: sns.Topic
+    ) -> cloudwatch.Alarm:
+        '''Create an alarm on the number of messages in a dead letter queue that notifies the alert topic'''
+
+        # Create a cloud-watch metric for the number of items in the dead letter queue
+        # Use the maximum rather than the default average so that bursts trigger the alarm sooner
+        dlq_metric = dlq.metric_approximate_number_of_messages_visible(
+            period=Duration.minutes(1),
+            statistic=cloudwatch.Stats.MAXIMUM
+        )
+
+        # Create a cloud-watch alarm when the dead letter queue reaches the threshold
+        dlq_alarm = cloudwatch.Alarm(
+            self, alarm_id,
+            metric=dlq_metric,
+            evaluation_periods=1,
+            threshold=threshold,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            alarm_description=alarm_description
+        )
+
+        # Send SNS notification when the alarm triggers
+        dlq_alarm.add_alarm_action(cw_actions.SnsAction(alert_topic))
+
+        return dlq_alarm
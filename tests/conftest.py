@@ -0,0 +1,8 @@
+'''Shared pytest configuration for the Serverless Snacks tests'''
+
+import sys
+from pathlib import Path
+
+# The lambdas import their shared module as "common" (the lambdas directory is the task root),
+# so put the lambdas directory on the path when importing them from the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambdas"))
@@ -1,10 +1,10 @@
 '''Unit tests for the Serverless Snacks application stack and the lambda functions'''
 
-from os import environ
 from json import loads, dumps
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
+import pytest
 from aws_cdk import App
-from aws_cdk.assertions import Template
+from aws_cdk.assertions import Match, Template
 
 # Import the Serverless Snack stack
 from serverless_snacks.serverless_snacks_stack import ServerlessSnacksStack
@@ -13,33 +13,86 @@ from serverless_snacks.serverless_snacks_stack import ServerlessSnacksStack
 from lambdas.order_creator import handler as order_creation_handler
 
 
-def test_stack_resources():
-    '''Test that the stack contains the expected resources'''
+@pytest.fixture(scope="module")
+def template():
+    '''Synthesise the stack once and share the template between the stack tests'''
 
-    app = App()
+    # Skip the docker bundling of the lambda assets, the tests only inspect the template
+    app = App(context={"aws:cdk:bundling-stacks": []})
     stack = ServerlessSnacksStack(app, "ServerlessSnacksStack")
-    template = Template.from_stack(stack)
+    return Template.from_stack(stack)
+
+
+def test_stack_resources(template):
+    '''Test that the stack contains the expected resources'''
 
     # Verify dynamo table exists
     template.resource_count_is("AWS::DynamoDB::Table", 1)
     template.has_resource_properties("AWS::DynamoDB::Table", {
-        "KeySchema": [{"AttributeName": "orderId", "KeyType": "HASH"}]
+        "KeySchema": [{"AttributeName": "orderId", "KeyType": "HASH"}],
+        "StreamSpecification": {"StreamViewType": "NEW_IMAGE"}
     })
 
     # Verify 2 lambda functions exist
     template.resource_count_is("AWS::Lambda::Function", 2)
 
+    # Verify the lambda functions run Python 3.12 on arm64 (Graviton) with 512MB and a 10s timeout
+    template.all_resources_properties("AWS::Lambda::Function", {
+        "Runtime": "python3.12",
+        "Architectures": ["arm64"],
+        "MemorySize": 512,
+        "Timeout": 10
+    })
+
+    # Verify the order creator has SnapStart enabled and is published behind an alias
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "SnapStart": {"ApplyOn": "PublishedVersions"}
+    })
+    template.resource_count_is("AWS::Lambda::Version", 1)
+    template.resource_count_is("AWS::Lambda::Alias", 1)
+
     # Verify event-bridge rule exists
     template.resource_count_is("AWS::Events::Rule", 1)
 
-    # Verify dead letter queue exists
-    template.resource_count_is("AWS::SQS::Queue", 1)
+    # Verify the pipe publishing OrderCreated events from the table stream exists
+    template.resource_count_is("AWS::Pipes::Pipe", 1)
+    template.has_resource_properties("AWS::Pipes::Pipe", {
+        "SourceParameters": {
+            "DynamoDBStreamParameters": {
+                "StartingPosition": "LATEST",
+                "MaximumRetryAttempts": 3,
+                "DeadLetterConfig": {"Arn": Match.any_value()}
+            },
+            # Only new orders are published
+            "FilterCriteria": {
+                "Filters": [{"Pattern": dumps({"eventName": ["INSERT"]})}]
+            }
+        },
+        "TargetParameters": {
+            "EventBridgeEventBusParameters": {
+                "Source": "serverless.snacks",
+                "DetailType": "OrderCreated"
+            },
+            # The detail is the raw stream record (an input template would not escape the values)
+            "InputTemplate": Match.absent()
+        }
+    })
+
+    # Verify the pipe is only created once its role policy grants the stream, bus and DLQ access
+    template.has_resource("AWS::Pipes::Pipe", {
+        "DependsOn": Match.array_with([
+            Match.string_like_regexp("^OrderCreatedPipeRoleDefaultPolicy")
+        ])
+    })
+
+    # Verify the dead letter queues exist (order processing and pipe delivery)
+    template.resource_count_is("AWS::SQS::Queue", 2)
 
     # Verify SNS topic for dead letter queue alerts
     template.resource_count_is("AWS::SNS::Topic", 1)
 
-    # Verify cloud-watch alarm for the dead letter queue
-    template.resource_count_is("AWS::CloudWatch::Alarm", 1)
+    # Verify cloud-watch alarms for both dead letter queues
+    template.resource_count_is("AWS::CloudWatch::Alarm", 2)
 
     # Verify SNS subscription exists
     template.resource_count_is("AWS::SNS::Subscription", 1)
@@ -48,25 +101,22 @@ def test_stack_resources():
     template.has_resource_properties("AWS::CloudWatch::Alarm", {
         "Threshold": 5,
         "ComparisonOperator": "GreaterThanOrEqualToThreshold",
-        "AlarmDescription": "Alarm if there are 5 or more messages in the DLQ"
+        "AlarmDescription": "Alarm if there are 5 or more messages in the DLQ",
+        "Statistic": "Maximum"
+    })
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "Threshold": 1,
+        "ComparisonOperator": "GreaterThanOrEqualToThreshold",
+        "AlarmDescription": "Alarm if any OrderCreated events could not be published by the pipe",
+        "Statistic": "Maximum"
     })
 
 
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
 @patch("lambdas.order_creator.dynamodb")
-@patch("lambdas.order_creator.events_client")
-def test_order_creator_handler(mock_events_client, mock_dynamodb_resource):
+def test_order_creator_handler(mock_dynamodb_client):
     '''Test the order creation lambda handler'''
 
-    # Setup environment
-    environ["TABLE_NAME"] = "OrdersTable"
-
-    # Mock dynamo table and put_item
-    mock_table = MagicMock()
-    mock_dynamodb_resource.Table.return_value = mock_table
-
-    # Mock event-bridge put_events
-    mock_events_client.put_events.return_value = {"FailedEntryCount": 0, "Entries": []}
-
     # Create the event and context
     event = {"body": dumps({"orderId": "123", "item": "chips"})}
     context = {}
@@ -80,33 +130,32 @@ def test_order_creator_handler(mock_events_client, mock_dynamodb_resource):
     assert body["status"] == "NEW"
 
     # Validate dynamo call
-    mock_table.put_item.assert_called_once_with(
-        Item={"orderId": "123", "status": "NEW", "item": "chips"},
-        ConditionExpression=mock_table.put_item.call_args.kwargs["ConditionExpression"]
+    mock_dynamodb_client.put_item.assert_called_once_with(
+        TableName="OrdersTable",
+        Item={"orderId": {"S": "123"}, "status": {"S": "NEW"}, "item": {"S": "chips"}},
+        ConditionExpression="attribute_not_exists(orderId)",
+        ReturnValues="NONE",
+        ReturnConsumedCapacity="NONE",
+        ReturnItemCollectionMetrics="NONE"
     )
 
-    # Validate that 1 event was sent to event-bridge
-    mock_events_client.put_events.assert_called_once()
 
-
-def test_dlq_alarm_metric():
+def test_dlq_alarm_metric(template):
     '''Test that the dead letter queue alarm is associated with the correct metric'''
 
-    app = App()
-    stack = ServerlessSnacksStack(app, "ServerlessSnacksStack")
-    template = Template.from_stack(stack)
-
     alarms = template.find_resources("AWS::CloudWatch::Alarm")
-    assert len(alarms) == 1
-    alarm_props = list(alarms.values())[0]["Properties"]
+    assert len(alarms) == 2
 
-    metric_name = (
-        alarm_props["Metrics"][0]["MetricStat"]["Metric"]["MetricName"]
-        if "Metrics" in alarm_props
-        else alarm_props.get("MetricName")
-    )
+    for alarm in alarms.values():
+        alarm_props = alarm["Properties"]
+
+        metric_name = (
+            alarm_props["Metrics"][0]["MetricStat"]["Metric"]["MetricName"]
+            if "Metrics" in alarm_props
+            else alarm_props.get("MetricName")
+        )
 
-    assert metric_name in [
-        "ApproximateNumberOfMessagesVisible", 
-        "ApproximateNumberOfMessagesNotVisible"
-    ]
+        assert metric_name in [
+            "ApproximateNumberOfMessagesVisible", 
+            "ApproximateNumberOfMessagesNotVisible"
+        ]
@@ -1,18 +1,18 @@
 import pytest
-from os import environ
-from json import dumps
-from unittest.mock import patch, MagicMock
+from json import dumps, loads
+from unittest.mock import patch
 from lambdas import order_creator, order_processor
+from common import client_config
 from botocore.exceptions import ClientError
 
 # -----------------------------
 # order_creator lambda tests
 # -----------------------------
 
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
 @patch("lambdas.order_creator.dynamodb")
-def test_order_creator_missing_orderId(mock_dynamodb_resource):
+def test_order_creator_missing_orderId(mock_dynamodb_client):
     """Test order_creator Lambda with missing orderId"""
-    environ["TABLE_NAME"] = "OrdersTable"
     event = {"body": dumps({"item": "chips"})}
     context = {}
 
@@ -21,10 +21,64 @@ def test_order_creator_missing_orderId(mock_dynamodb_resource):
     assert "Missing 'orderId'" in response["body"]
 
 
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
 @patch("lambdas.order_creator.dynamodb")
-def test_order_creator_invalid_json(mock_dynamodb_resource):
+def test_order_creator_direct_invoke(mock_dynamodb_client):
+    """Test order_creator Lambda invoked directly with the order as the event"""
+    event = {"orderId": "123", "item": "chips"}
+    context = {}
+
+    response = order_creator.handler(event, context)
+    assert response["statusCode"] == 200
+    mock_dynamodb_client.put_item.assert_called_once()
+
+
+@pytest.mark.parametrize("order", [
+    {"orderId": 5, "item": "chips"},
+    {"orderId": "123", "item": {"name": "chips"}},
+    {"orderId": "123", "item": 5}
+])
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_creator.dynamodb")
+def test_order_creator_non_string_fields(mock_dynamodb_client, order):
+    """Test order_creator Lambda rejects a non-string orderId or item"""
+    event = {"body": dumps(order)}
+    context = {}
+
+    response = order_creator.handler(event, context)
+    assert response["statusCode"] == 400
+    assert "must be a string" in response["body"]
+    mock_dynamodb_client.put_item.assert_not_called()
+
+
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_creator.dynamodb")
+def test_order_creator_null_item(mock_dynamodb_client):
+    """Test order_creator Lambda stores a null item as 'unknown'"""
+    event = {"body": dumps({"orderId": "123", "item": None})}
+    context = {}
+
+    response = order_creator.handler(event, context)
+    assert response["statusCode"] == 200
+    item = mock_dynamodb_client.put_item.call_args.kwargs["Item"]
+    assert item["item"] == {"S": "unknown"}
+
+
+@patch("lambdas.order_creator.TABLE_NAME", None)
+def test_order_creator_missing_table():
+    """Test order_creator Lambda when TABLE_NAME was not set at import"""
+    event = {"body": dumps({"orderId": "123", "item": "chips"})}
+    context = {}
+
+    response = order_creator.handler(event, context)
+    assert response["statusCode"] == 500
+    assert "Server misconfiguration" in response["body"]
+
+
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_creator.dynamodb")
+def test_order_creator_invalid_json(mock_dynamodb_client):
     """Test order_creator Lambda with invalid JSON"""
-    environ["TABLE_NAME"] = "OrdersTable"
     event = {"body": "{invalid_json"}
     context = {}
 
@@ -33,17 +87,26 @@ def test_order_creator_invalid_json(mock_dynamodb_resource):
     assert "Invalid JSON" in response["body"]
 
 
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
 @patch("lambdas.order_creator.dynamodb")
-@patch("lambdas.order_creator.events_client")
-def test_order_creator_duplicate_order(mock_events_client, mock_dynamodb_resource):
-    """Test order_creator Lambda when the order already exists"""
-    environ["TABLE_NAME"] = "OrdersTable"
+def test_order_creator_non_object_body(mock_dynamodb_client):
+    """Test order_creator Lambda with a JSON body that is not an object"""
+    event = {"body": dumps(["chips"])}
+    context = {}
+
+    response = order_creator.handler(event, context)
+    assert response["statusCode"] == 400
+    assert "Invalid JSON" in response["body"]
+    mock_dynamodb_client.put_item.assert_not_called()
+
 
-    mock_table = MagicMock()
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_creator.dynamodb")
+def test_order_creator_duplicate_order(mock_dynamodb_client):
+    """Test order_creator Lambda when the order already exists"""
     # Simulate DynamoDB conditional check failure
     error_response = {"Error": {"Code": "ConditionalCheckFailedException"}}
-    mock_table.put_item.side_effect = ClientError(error_response, "PutItem")
-    mock_dynamodb_resource.Table.return_value = mock_table
+    mock_dynamodb_client.put_item.side_effect = ClientError(error_response, "PutItem")
 
     event = {"body": dumps({"orderId": "123", "item": "chips"})}
     context = {}
@@ -56,36 +119,108 @@ def test_order_creator_duplicate_order(mock_events_client, mock_dynamodb_resourc
 # order_processor lambda tests
 # -----------------------------
 
+def order_created_event(order_id, item="chips"):
+    """Build an OrderCreated event, whose detail is the table stream record of the new order"""
+    return {
+        "detail-type": "OrderCreated",
+        "source": "serverless.snacks",
+        "detail": {
+            "eventName": "INSERT",
+            "dynamodb": {
+                "Keys": {"orderId": {"S": order_id}},
+                "NewImage": {"orderId": {"S": order_id}, "status": {"S": "NEW"}, "item": {"S": item}}
+            }
+        }
+    }
+
+
+@patch("lambdas.order_processor.TABLE_NAME", "OrdersTable")
 @patch("lambdas.order_processor.dynamodb")
-def test_order_processor_success(mock_dynamodb_resource):
+def test_order_processor_success(mock_dynamodb_client):
     """Test order_processor Lambda successful update"""
-    environ["TABLE_NAME"] = "OrdersTable"
-
-    mock_table = MagicMock()
-    mock_dynamodb_resource.Table.return_value = mock_table
-
-    event = {"detail": {"orderId": "123"}}
+    event = order_created_event("123")
     context = {}
 
     response = order_processor.handler(event, context)
     assert response["statusCode"] == 200
     assert "PROCESSED" in response["body"]
-    mock_table.update_item.assert_called_once()
+    mock_dynamodb_client.update_item.assert_called_once()
+
+    # The condition is sent as a raw expression string rather than built with Attr
+    kwargs = mock_dynamodb_client.update_item.call_args.kwargs
+    assert kwargs["ConditionExpression"] == "attribute_exists(orderId)"
 
 
+@patch("lambdas.order_processor.TABLE_NAME", "OrdersTable")
 @patch("lambdas.order_processor.dynamodb")
-def test_order_processor_order_not_exist(mock_dynamodb_resource):
-    """Test order_processor Lambda when order does not exist"""
-    environ["TABLE_NAME"] = "OrdersTable"
+def test_order_processor_non_string_order_id(mock_dynamodb_client):
+    """Test order_processor Lambda rejects a non-string orderId"""
+    event = order_created_event(5)
+    context = {}
 
-    mock_table = MagicMock()
+    response = order_processor.handler(event, context)
+    assert response["statusCode"] == 400
+    assert "Invalid event payload" in response["body"]
+    mock_dynamodb_client.update_item.assert_not_called()
+
+
+@patch("lambdas.order_processor.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_processor.dynamodb")
+def test_order_processor_order_not_exist(mock_dynamodb_client):
+    """Test order_processor Lambda when order does not exist"""
     error_response = {"Error": {"Code": "ConditionalCheckFailedException"}}
-    mock_table.update_item.side_effect = ClientError(error_response, "UpdateItem")
-    mock_dynamodb_resource.Table.return_value = mock_table
+    mock_dynamodb_client.update_item.side_effect = ClientError(error_response, "UpdateItem")
 
-    event = {"detail": {"orderId": "123"}}
+    event = order_created_event("123")
     context = {}
 
     with pytest.raises(ClientError) as exc:
         order_processor.handler(event, context)
     assert "ConditionalCheckFailedException" in str(exc.value)
+
+# -----------------------------
+# shared client config tests
+# -----------------------------
+
+@pytest.mark.parametrize("order_id", [5, 1.5, True, ["123"], {"S": "123"}])
+@patch("lambdas.order_processor.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_processor.dynamodb")
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_creator.dynamodb")
+def test_type_guards_with_parameter_validation_disabled(
+    mock_creator_client, mock_processor_client, order_id
+):
+    """Test both handlers reject non-string orderIds, as botocore no longer validates them"""
+    assert client_config.parameter_validation is False
+
+    response = order_creator.handler({"body": dumps({"orderId": order_id, "item": "chips"})}, {})
+    assert response["statusCode"] == 400
+    mock_creator_client.put_item.assert_not_called()
+
+    response = order_processor.handler(order_created_event(order_id), {})
+    assert response["statusCode"] == 400
+    mock_processor_client.update_item.assert_not_called()
+
+# -----------------------------
+# OrderCreated event contract tests
+# -----------------------------
+
+@pytest.mark.parametrize("item", ["chips", '12" sub', "back\\slash", "tab\tand\nnewline"])
+@patch("lambdas.order_processor.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_processor.dynamodb")
+@patch("lambdas.order_creator.TABLE_NAME", "OrdersTable")
+@patch("lambdas.order_creator.dynamodb")
+def test_order_created_event_contract(mock_creator_client, mock_processor_client, item):
+    """Test that any order the creator accepts can be processed from its stream record"""
+    response = order_creator.handler({"body": dumps({"orderId": "123", "item": item})}, {})
+    assert response["statusCode"] == 200
+
+    # The pipe forwards the stream record (the written item as its NewImage) as the event detail
+    written = mock_creator_client.put_item.call_args.kwargs["Item"]
+    detail = {"eventName": "INSERT", "dynamodb": {"Keys": {"orderId": written["orderId"]}, "NewImage": written}}
+    event = loads(dumps({"detail-type": "OrderCreated", "detail": detail}))
+
+    response = order_processor.handler(event, {})
+    assert response["statusCode"] == 200
+    kwargs = mock_processor_client.update_item.call_args.kwargs
+    assert kwargs["Key"] == {"orderId": {"S": "123"}}